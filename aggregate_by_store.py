@@ -1,4 +1,10 @@
 import argparse
+import functools
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
@@ -9,6 +15,329 @@ INPUT_DIR = Path("./input")
 AGGREGATE_INPUT_DIR = INPUT_DIR / "aggregate"
 OUTPUT_DIR = Path("./output")
 
+# 輸出格式（由 --format 切換）：
+#   csv        — 每商店一個資料夾一個檔（預設，相容既有下游）
+#   csv-single — 單一合併檔，商店序號為一般欄位；
+#                省去數千個小檔案的 inode/metadata 開銷，是最快的輸出路徑
+OUTPUT_FORMAT = "csv"
+
+
+# ===============================
+# CSV 載入（跨 config 共用快取）
+# ===============================
+# 每個來源檔實際會用到的欄位；其餘欄位在解析階段就跳過
+REQUIRED_COLS = {
+    "區間綁定推薦人人數.csv": ["商店序號", "年度", "月份", "總綁定"],
+    "累計至今綁定推薦人人數.csv": ["商店序號", "累計至今推薦人綁定人數"],
+    "14-1.會員成長趨勢_新增註冊會員數卡片.csv": ["商店序號", "總會員數"],
+    "門市首購人數_月份.csv": ["商店序號", "月份", "門市首購人數"],
+    "門市首購人數_門市.csv": ["商店序號", "門市名稱", "門市首購人數"],
+    "各門市累計綁定人數.csv": ["商店序號", "門市名稱", "年度", "總綁定數"],
+}
+
+# 欄名變體（小寫比對）：報表匯出時月份／門市名稱欄位常有別名，
+# 先保留下來，讓 _ensure_month_col / _ensure_store_name_col 處理改名
+_ALIAS_COLS_LC = frozenset({
+    "月", "月份(數字)", "month", "established at month",
+    "門市", "store name", "store_name", "name",
+    "門市名稱(中文)", "門市名稱（中文）",
+})
+
+
+@functools.lru_cache(maxsize=32)
+def _load_csv_cached(path_str: str, mtime_ns: int) -> pd.DataFrame:
+    wanted = REQUIRED_COLS.get(Path(path_str).name)
+    if wanted is None:
+        df = pd.read_csv(path_str, dtype=str)
+    else:
+        wanted_set = set(wanted)
+        df = pd.read_csv(
+            path_str,
+            dtype=str,
+            usecols=lambda c: (
+                str(c).strip() in wanted_set
+                or str(c).strip().lower() in _ALIAS_COLS_LC
+            ),
+        )
+    df.columns = df.columns.astype(str).str.strip()
+    return df
+
+
+def _load_csv(path: Path) -> pd.DataFrame:
+    # 同一個 process 連跑多個 config 時，同一份來源檔只解析一次；
+    # 以 mtime 當 cache key，檔案更新後自動失效
+    df = _load_csv_cached(str(path), path.stat().st_mtime_ns)
+    return df.copy(deep=False)
+
+
+# ===============================
+# 依商店序號輸出（共用 writer）
+# ===============================
+# 同一個 process 內建過的商店目錄；重複呼叫時連 stat/mkdir 都省掉
+_CREATED_STORE_DIRS: set = set()
+
+
+def _ensure_store_dirs(store_ids) -> None:
+    # 一次建立所有商店目錄，寫檔迴圈內不再需要任何 mkdir/stat
+    for sid in store_ids:
+        store_dir = OUTPUT_DIR / str(sid)
+        if store_dir not in _CREATED_STORE_DIRS:
+            store_dir.mkdir(parents=True, exist_ok=True)
+            _CREATED_STORE_DIRS.add(store_dir)
+
+
+def _write_per_store(result: pd.DataFrame, store_col: str, filename: str):
+    if OUTPUT_FORMAT == "csv-single":
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        # 合併檔可能很大：1MB 緩衝 + chunksize 讓 pandas 分批格式化，
+        # 不會先在記憶體組出整份 CSV 字串才寫出
+        with open(
+            OUTPUT_DIR / filename,
+            "w",
+            newline="",
+            encoding="utf-8",
+            buffering=1024 * 1024,
+        ) as f:
+            f.write("\ufeff")
+            result.to_csv(f, index=False, chunksize=50_000)
+        return
+
+    if result.empty:
+        # 沒有任何商店可輸出：不必建 thread pool 與 groupby
+        return
+
+    _ensure_store_dirs(result[store_col].unique())
+
+    def _write(item):
+        sid, g = item
+        # 先寫一次 BOM 再用純 utf-8 輸出：結果與 utf-8-sig 相同，
+        # 但 pandas 的 CSV writer 可以走 utf-8 fast path
+        path = OUTPUT_DIR / str(sid) / filename
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            f.write("\ufeff")
+            g.to_csv(f, index=False)
+
+    # to_csv 寫檔時會釋放 GIL，用 thread pool 重疊大量小檔案的磁碟 I/O
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 4) * 2)) as ex:
+        list(ex.map(_write, result.groupby(store_col, sort=False)))
+
+# ===============================
+# 數值欄位正規化（共用）
+# ===============================
+# pattern 都是常數：模組層級編譯一次，熱迴圈內不再查 re._cache
+_NUM_JUNK_RE = re.compile(r"[,%\s]")
+_MONTH_TAIL_RE = re.compile(r"(\d{1,2})\D*$")
+
+def _safe_ratio(num: pd.Series, den: pd.Series) -> pd.Series:
+    # num / den，分母為 0 時輸出 NaN。
+    # 用單一 np.divide(where=) 把相除與除零遮罩融合成一個 ufunc 迴圈，
+    # 取代「先除再 .where(den != 0)」產生的兩個中間 Series
+    num_a = num.to_numpy(dtype="float64")
+    den_a = den.to_numpy(dtype="float64")
+    out = np.full(num_a.shape, np.nan)
+    np.divide(num_a, den_a, out=out, where=den_a != 0)
+    return pd.Series(out, index=num.index)
+
+
+def _yoy(cur: pd.Series, prev: pd.Series) -> pd.Series:
+    # (cur - prev) / prev，prev 為 0（或缺值）時輸出 NaN
+    cur_a = cur.to_numpy(dtype="float64")
+    prev_a = prev.to_numpy(dtype="float64")
+    out = np.full(cur_a.shape, np.nan)
+    np.divide(cur_a - prev_a, prev_a, out=out, where=prev_a != 0)
+    return pd.Series(out, index=cur.index)
+
+
+def _fmt_pct(s: pd.Series) -> np.ndarray:
+    # 向量化百分比格式：NaN 輸出空字串，其餘輸出 "12.34%"。
+    # np.char.mod 在 C 層一次格式化整個陣列，
+    # 取代 .map 逐元素進出 Python format 的開銷。
+    # 回傳 ndarray：呼叫端都是 frame[col] = _fmt_pct(frame[col])，
+    # 直接按位置塞回即可，省掉包 Series 再做 index 對齊
+    arr = s.to_numpy(dtype="float64")
+    mask = np.isnan(arr)
+    out = np.full(arr.shape, "", dtype=object)
+    valid = ~mask
+    out[valid] = np.char.add(np.char.mod("%.2f", arr[valid] * 100), "%")
+    return out
+
+
+def _parse_month(series: pd.Series) -> pd.Series:
+    # Accept formats like "01", "1", "202501", "2025-01", "2025/01", "2025-1"：
+    # 單一 regex 擷取結尾的月份數字，僅保留 1–12；
+    # 存成 Int8，讓後續以月份為 key 的 merge/groupby 成本更低
+    s = series.astype(str).str.extract(_MONTH_TAIL_RE, expand=False)
+    m = pd.to_numeric(s, errors="coerce")
+    return m.where(m.between(1, 12)).astype("Int8")
+
+
+# 欄名別名（小寫、已 strip；依優先序排列）
+_MONTH_ALIASES_LC = ("月份", "月", "月份(數字)", "month", "established at month")
+_STORE_NAME_ALIASES_LC = (
+    "門市名稱", "門市", "store name", "store_name", "name",
+    "門市名稱(中文)", "門市名稱（中文）",
+)
+
+
+def _rename_first_alias(
+    df: pd.DataFrame, aliases_lc: tuple, preferred: str, what: str
+) -> pd.DataFrame:
+    # 只建一次 lowered 索引，再依優先序找第一個命中的別名
+    if preferred in df.columns:
+        return df
+    cols_lc = {str(c).strip().lower(): c for c in df.columns}
+    for alias in aliases_lc:
+        if alias in cols_lc:
+            return df.rename(columns={cols_lc[alias]: preferred})
+    raise KeyError(
+        f"Cannot find {what} column. Available columns: {list(df.columns)}"
+    )
+
+
+def _ensure_month_col(df: pd.DataFrame, preferred: str = "月份") -> pd.DataFrame:
+    return _rename_first_alias(df, _MONTH_ALIASES_LC, preferred, "month")
+
+
+def _ensure_store_name_col(df: pd.DataFrame, preferred: str = "門市名稱") -> pd.DataFrame:
+    return _rename_first_alias(df, _STORE_NAME_ALIASES_LC, preferred, "store name")
+
+
+def _to_number(series: pd.Series, fill_zero: bool = False) -> pd.Series:
+    # Normalize human-formatted numbers like "12,345", " 123 ", "45%".
+    # 單一 regex pass 移除逗號／百分號／空白；空字串與 "nan"/"None"
+    # 由 to_numeric(errors="coerce") 轉成 NaN。
+    # 人數／綁定數這類 count 值用不到 64 bit：整數欄降為最小整數
+    # 型別、浮點欄降為 float32，後續 merge/groupby 的記憶體流量
+    # 減半。注意：降出來的窄型別只保證裝得下「單筆」值，加總後的
+    # 結果不可再 astype 回這個 dtype（會溢位迴繞），整數來源的
+    # 彙總欄一律轉 int64；YoY 與比率的除法在 _yoy/_safe_ratio 內
+    # 已明確升回 float64 計算。
+    if pd.api.types.is_numeric_dtype(series):
+        # 已是數值欄（例如從正規化表二次經過）：跳過字串清理
+        out = series
+    else:
+        s = series.astype(str).str.replace(_NUM_JUNK_RE, "", regex=True)
+        out = pd.to_numeric(s, errors="coerce")
+    kind = "integer" if out.dtype.kind in "iu" else "float"
+    if fill_zero and out.dtype.kind == "f":
+        # 轉出時一併把 NaN 歸零（單次 copy+fill），
+        # 取代呼叫端另跑一趟 .fillna(0) 的獨立 mask pass
+        out = pd.Series(out.to_numpy(na_value=0.0), index=out.index)
+    return pd.to_numeric(out, downcast=kind)
+
+
+# ===============================
+# 正規化來源表（跨 config 共用）
+# ===============================
+# 23-1/23-2/24-1/24-2 對同一份來源檔做的前處理（strip 商店序號、
+# 解析月份、數值轉型）完全相同；集中在這裡做一次並以 mtime 快取，
+# 各 config 從正規化後的表出發，只剩純 group/pivot 運算
+
+@functools.lru_cache(maxsize=2)
+def _interval_bind_cached(path_str: str, mtime_ns: int) -> pd.DataFrame:
+    df = _load_csv_cached(path_str, mtime_ns).copy(deep=False)
+    df = _ensure_month_col(df)
+    df["商店序號"] = df["商店序號"].str.strip()
+    df["月份"] = _parse_month(df["月份"])
+    df = df[df["月份"].notna()]
+    df["總綁定"] = _to_number(df["總綁定"], fill_zero=True)
+    return df
+
+
+def _load_interval_bind() -> pd.DataFrame:
+    path = AGGREGATE_INPUT_DIR / "區間綁定推薦人人數.csv"
+    return _interval_bind_cached(str(path), path.stat().st_mtime_ns).copy(deep=False)
+
+
+@functools.lru_cache(maxsize=2)
+def _cumulative_bind_cached(path_str: str, mtime_ns: int) -> pd.DataFrame:
+    df = _load_csv_cached(path_str, mtime_ns).copy(deep=False)
+    df["商店序號"] = df["商店序號"].str.strip()
+    df["累計至今推薦人綁定人數"] = _to_number(df["累計至今推薦人綁定人數"], fill_zero=True)
+    return df
+
+
+def _load_cumulative_bind() -> pd.DataFrame:
+    path = AGGREGATE_INPUT_DIR / "累計至今綁定推薦人人數.csv"
+    return _cumulative_bind_cached(str(path), path.stat().st_mtime_ns).copy(deep=False)
+
+
+@functools.lru_cache(maxsize=2)
+def _member_total_cached(path_str: str, mtime_ns: int) -> pd.DataFrame:
+    df = _load_csv_cached(path_str, mtime_ns).copy(deep=False)
+    df["商店序號"] = df["商店序號"].str.strip()
+    df["總會員數"] = _to_number(df["總會員數"], fill_zero=True)
+    return df
+
+
+def _load_member_total() -> pd.DataFrame:
+    path = AGGREGATE_INPUT_DIR / "14-1.會員成長趨勢_新增註冊會員數卡片.csv"
+    return _member_total_cached(str(path), path.stat().st_mtime_ns).copy(deep=False)
+
+
+@functools.lru_cache(maxsize=2)
+def _store_first_purchase_cached(path_str: str, mtime_ns: int) -> pd.DataFrame:
+    df = _load_csv_cached(path_str, mtime_ns).copy(deep=False)
+    df = _ensure_month_col(df)
+    df["商店序號"] = df["商店序號"].str.strip()
+    df["月份"] = _parse_month(df["月份"])
+    df = df[df["月份"].notna()]
+    df["門市首購人數"] = _to_number(df["門市首購人數"], fill_zero=True)
+    return df
+
+
+def _load_store_first_purchase() -> pd.DataFrame:
+    path = AGGREGATE_INPUT_DIR / "門市首購人數_月份.csv"
+    return _store_first_purchase_cached(str(path), path.stat().st_mtime_ns).copy(deep=False)
+
+
+# 門市名稱欄位視同空值的字串（報表匯出時常見的佔位字樣）
+_BLANK_NAME_TOKENS = ("", "nan", "NaN", "NULL", "None")
+
+
+@functools.lru_cache(maxsize=2)
+def _store_referral_ratio_cached(
+    fp_path: str, fp_mtime_ns: int, ref_path: str, ref_mtime_ns: int
+) -> pd.DataFrame:
+    # 25-1 / 25-2 共用的門市層級佔比表：
+    # 首購人數 merge 2025 綁定加總後算佔比，兩個 config 只差取前／後 5 名
+    def _clean(df: pd.DataFrame) -> pd.DataFrame:
+        df = _ensure_store_name_col(df)
+        df["商店序號"] = df["商店序號"].str.strip()
+        # strip 後用單一 isin mask 把佔位字樣轉成缺值，
+        # 取代 replace 逐一比對多個字串的多次掃描
+        name = df["門市名稱"].str.strip()
+        df["門市名稱"] = name.mask(name.isin(_BLANK_NAME_TOKENS))
+        return df[df["門市名稱"].notna()]
+
+    df_fp = _clean(_load_csv_cached(fp_path, fp_mtime_ns).copy(deep=False))
+    df_fp["門市首購人數"] = _to_number(df_fp["門市首購人數"], fill_zero=True)
+
+    df_ref = _clean(_load_csv_cached(ref_path, ref_mtime_ns).copy(deep=False))
+    df_ref = df_ref[df_ref["年度"] == "2025"]
+    df_ref["總綁定數"] = _to_number(df_ref["總綁定數"], fill_zero=True)
+
+    ref_sum = (
+        df_ref
+        .groupby(["商店序號", "門市名稱"], as_index=False)["總綁定數"]
+        .sum()
+        .rename(columns={"總綁定數": "推薦人綁定人數"})
+    )
+
+    result = df_fp.merge(ref_sum, on=["商店序號", "門市名稱"], how="left")
+    result["推薦人綁定人數"] = result["推薦人綁定人數"].fillna(0)
+    result["佔比"] = _safe_ratio(result["推薦人綁定人數"], result["門市首購人數"])
+    return result
+
+
+def _build_store_referral_ratio() -> pd.DataFrame:
+    fp = AGGREGATE_INPUT_DIR / "門市首購人數_門市.csv"
+    ref = AGGREGATE_INPUT_DIR / "各門市累計綁定人數.csv"
+    return _store_referral_ratio_cached(
+        str(fp), fp.stat().st_mtime_ns, str(ref), ref.stat().st_mtime_ns
+    ).copy(deep=False)
+
+
 # ===============================
 # Configs: 六個需求（以編號作為 key）
 # ===============================
@@ -107,112 +436,83 @@ def run_aggregation(config_key: str):
 
     # ===== 23-1 KPI card (fixed full-year logic) =====
     if config_key == "23-1":
-        base_dir = INPUT_DIR / cfg["input_subdir"]
-
-        def _to_number(series: pd.Series) -> pd.Series:
-            # Normalize common human-formatted numbers like "12,345", " 123 ", "1,234.0", "45%"
-            s = series.astype(str).str.strip()
-            s = s.str.replace(",", "", regex=False)
-            s = s.str.replace("%", "", regex=False)
-            # Treat empty or "nan" as NaN for proper fillna downstream
-            s = s.replace({"": pd.NA, "nan": pd.NA, "None": pd.NA})
-            return pd.to_numeric(s, errors="coerce")
-
         # --- B：區間推薦人綁定人數（今年） ---
         src = cfg["sources"]["interval_bind"]
-        df = pd.read_csv(base_dir / src["file"], dtype=str)
-        df[src["store_col"]] = df[src["store_col"]].astype(str).str.strip()
-        # Normalize month to int 1–12 to avoid zero-padding mismatch
-        df[src["month_col"]] = (
-            df[src["month_col"]]
-            .astype(str)
-            .str.strip()
-            .str.replace(r"[^0-9]", "", regex=True)
-        )
-        df[src["month_col"]] = pd.to_numeric(df[src["month_col"]], errors="coerce")
-        df = df[df[src["month_col"]].between(1, 12)]
+        df = _load_interval_bind()
 
-        df[src["value_col"]] = _to_number(df[src["value_col"]]).fillna(0)
-
-        df_cur = df[
-            (df[src["year_col"]] == cfg["year_current"]) &
-            (df[src["month_col"]].isin(range(1, 13)))
-        ]
-
-        df_prev = df[
-            (df[src["year_col"]] == cfg["year_prev"]) &
-            (df[src["month_col"]].isin(range(1, 13)))
-        ]
-
-        cur_sum = (
-            df_cur.groupby(src["store_col"], as_index=False)[src["value_col"]]
+        # 一次 groupby 同時算出今年與去年的加總，
+        # 取代「各年度各掃一次 + merge」的兩段式寫法
+        agg = (
+            df[df[src["year_col"]].isin([cfg["year_current"], cfg["year_prev"]])]
+            .groupby([src["store_col"], src["year_col"]])[src["value_col"]]
             .sum()
-            .rename(columns={
-                src["store_col"]: "商店序號",
-                src["value_col"]: "區間推薦人綁定人數"
-            })
+            .unstack(src["year_col"])
         )
-        prev_sum = (
-            df_prev.groupby(src["store_col"], as_index=False)[src["value_col"]]
-            .sum()
+        for year in (cfg["year_current"], cfg["year_prev"]):
+            if year not in agg.columns:
+                agg[year] = float("nan")
+
+        # 僅保留今年有資料的商店（與原本以今年彙總為主表的 left merge 相同）
+        agg = agg[agg[cfg["year_current"]].notna()]
+
+        result = (
+            agg.reset_index()
             .rename(columns={
                 src["store_col"]: "商店序號",
-                src["value_col"]: "prev_value"
+                cfg["year_current"]: "區間推薦人綁定人數",
+                cfg["year_prev"]: "prev_value",
             })
         )
-        cur_sum["商店序號"] = cur_sum["商店序號"].astype(str).str.strip()
-        prev_sum["商店序號"] = prev_sum["商店序號"].astype(str).str.strip()
-
-        result = cur_sum.merge(prev_sum, on="商店序號", how="left")
+        result = result[["商店序號", "區間推薦人綁定人數", "prev_value"]]
 
-        result["區間推薦人綁定人數 YoY"] = (
-            (result["區間推薦人綁定人數"] - result["prev_value"]) / result["prev_value"]
-        ).where(result["prev_value"] != 0)
+        result["區間推薦人綁定人數 YoY"] = _yoy(
+            result["區間推薦人綁定人數"], result["prev_value"]
+        )
 
         result.drop(columns=["prev_value"], inplace=True)
 
         # --- D：推薦人綁定率 ---
         src_cum = cfg["sources"]["cumulative_bind"]
-        df_cum = pd.read_csv(base_dir / src_cum["file"], dtype=str)
-        df_cum[src_cum["store_col"]] = df_cum[src_cum["store_col"]].astype(str).str.strip()
-        df_cum[src_cum["value_col"]] = _to_number(df_cum[src_cum["value_col"]]).fillna(0)
+        df_cum = _load_cumulative_bind()
 
         src_mem = cfg["sources"]["member_total"]
-        df_mem = pd.read_csv(base_dir / src_mem["file"], dtype=str)
-        df_mem[src_mem["store_col"]] = df_mem[src_mem["store_col"]].astype(str).str.strip()
-        df_mem[src_mem["value_col"]] = _to_number(df_mem[src_mem["value_col"]]).fillna(0)
+        df_mem = _load_member_total()
 
+        # 兩張查表先設成 index，主表 index 化一次後連續 left join
+        # 補齊兩欄，省掉中間 merge 結果。注意不可把兩張表包成 list
+        # 一次 join：list 版會先對 index 聯集做 outer concat，查表
+        # 多出來的商店會讓左表整數欄升成 float64（輸出多出 ".0"）
         result = (
-            result
-            .merge(
-                df_cum[[src_cum["store_col"], src_cum["value_col"]]]
-                .rename(columns={src_cum["store_col"]: "商店序號"}),
-                on="商店序號",
-                how="left"
+            result.set_index("商店序號")
+            .join(
+                df_cum.set_index(src_cum["store_col"])[[src_cum["value_col"]]],
+                how="left",
             )
-            .merge(
-                df_mem[[src_mem["store_col"], src_mem["value_col"]]]
-                .rename(columns={src_mem["store_col"]: "商店序號"}),
-                on="商店序號",
-                how="left"
+            .join(
+                df_mem.set_index(src_mem["store_col"])[[src_mem["value_col"]]],
+                how="left",
             )
+            .reset_index()
         )
 
-        result[src_cum["value_col"]] = result[src_cum["value_col"]].fillna(0)
-        result[src_mem["value_col"]] = result[src_mem["value_col"]].fillna(0)
+        # 兩欄一次補 0，避免各自 fillna 重建一次欄位
+        result.fillna({src_cum["value_col"]: 0, src_mem["value_col"]: 0}, inplace=True)
 
-        result["推薦人綁定率"] = (
-            result[src_cum["value_col"]] / result[src_mem["value_col"]]
-        ).where(result[src_mem["value_col"]] != 0)
+        # unstack 會為缺年份補 NaN 而升成 float；整數來源轉回 int64
+        # 輸出才不會印成 "503.0"。放在 join 之後做，對齊過程若升了
+        # 型別也能轉回來（不可轉回 parse 時 downcast 的窄型別，
+        # 年度加總會溢位迴繞）
+        if df[src["value_col"]].dtype.kind in "iu":
+            result["區間推薦人綁定人數"] = (
+                result["區間推薦人綁定人數"].astype("int64")
+            )
 
-        # --- Format percentage fields ---
-        def _fmt_pct(x):
-            if pd.isna(x):
-                return ""
-            return f"{x * 100:.2f}%"
+        result["推薦人綁定率"] = _safe_ratio(
+            result[src_cum["value_col"]], result[src_mem["value_col"]]
+        )
 
-        result["區間推薦人綁定人數 YoY"] = result["區間推薦人綁定人數 YoY"].apply(_fmt_pct)
-        result["推薦人綁定率"] = result["推薦人綁定率"].apply(_fmt_pct)
+        result["區間推薦人綁定人數 YoY"] = _fmt_pct(result["區間推薦人綁定人數 YoY"])
+        result["推薦人綁定率"] = _fmt_pct(result["推薦人綁定率"])
 
         result = result[[
             "商店序號",
@@ -222,75 +522,52 @@ def run_aggregation(config_key: str):
         ]]
 
         # --- Output ---
-        for _, row in result.iterrows():
-            store_id = row["商店序號"]
-            store_dir = OUTPUT_DIR / str(store_id)
-            store_dir.mkdir(parents=True, exist_ok=True)
-
-            output_path = store_dir / "23-1.csv"
-            pd.DataFrame([row]).to_csv(
-                output_path, index=False, encoding="utf-8-sig"
-            )
+        _write_per_store(result, "商店序號", "23-1.csv")
 
         print(f"[OK] config=23-1, stores={len(result)}")
         return
 
     # ===== 23-2 Monthly YoY table =====
     if config_key == "23-2":
-        base_dir = INPUT_DIR / cfg["input_subdir"]
-
-        def _to_number(series: pd.Series) -> pd.Series:
-            s = series.astype(str).str.strip()
-            s = s.str.replace(",", "", regex=False)
-            s = s.replace({"": pd.NA, "nan": pd.NA, "None": pd.NA})
-            return pd.to_numeric(s, errors="coerce")
-
-        def _fmt_pct(x):
-            if pd.isna(x):
-                return ""
-            return f"{x * 100:.2f}%"
-
-        src_file = "區間綁定推薦人人數.csv"
         store_col = "商店序號"
         year_col = "年度"
         month_col = "月份"
         value_col = "總綁定"
 
-        df = pd.read_csv(base_dir / src_file, dtype=str)
-        df[store_col] = df[store_col].astype(str).str.strip()
-        df[month_col] = _to_number(df[month_col]).astype("Int64")
-        df[value_col] = _to_number(df[value_col]).fillna(0)
+        df = _load_interval_bind()
 
         # Only years we care about
         df = df[df[year_col].isin(["2024", "2025"])]
 
-        # Aggregate per store, month, year
-        agg = (
-            df.groupby([store_col, month_col, year_col], as_index=False)[value_col]
-            .sum()
-        )
+        # groupby/pivot 以整數 code 而非字串 hash 當 key
+        df[store_col] = df[store_col].astype("category")
+        df[year_col] = df[year_col].astype("category")
 
-        # Pivot to get 2024 / 2025 columns
+        # Aggregate + pivot to 2024 / 2025 columns in one hash pass
+        # （先 groupby 再 pivot_table 會對同一批 key 彙總兩次）
         pivot = (
-            agg.pivot_table(
+            df.pivot_table(
                 index=[store_col, month_col],
                 columns=year_col,
                 values=value_col,
                 aggfunc="sum",
                 fill_value=0,
+                observed=True,
             )
             .reset_index()
         )
 
-        # Ensure all months 1–12 exist per store
-        stores = pivot[store_col].unique()
-        full = []
-        for sid in stores:
-            tmp = pivot[pivot[store_col] == sid].set_index(month_col)
-            tmp = tmp.reindex(range(1, 13), fill_value=0).reset_index()
-            tmp[store_col] = sid
-            full.append(tmp)
-        result = pd.concat(full, ignore_index=True)
+        # Ensure all months 1–12 exist per store（單次 MultiIndex reindex，
+        # 取代逐商店 boolean filter + concat）
+        idx = pd.MultiIndex.from_product(
+            [pivot[store_col].unique(), pd.array(range(1, 13), dtype="Int8")],
+            names=[store_col, month_col],
+        )
+        result = (
+            pivot.set_index([store_col, month_col])
+            .reindex(idx, fill_value=0)
+            .reset_index()
+        )
 
         # Rename year columns
         result = result.rename(columns={
@@ -300,102 +577,78 @@ def run_aggregation(config_key: str):
         })
 
         # YoY calculation
-        result["推薦人新綁定數 YoY"] = (
-            (result["2025年"] - result["2024年"]) / result["2024年"]
-        ).where(result["2024年"] != 0)
+        result["推薦人新綁定數 YoY"] = _yoy(result["2025年"], result["2024年"])
 
-        result["推薦人新綁定數 YoY"] = result["推薦人新綁定數 YoY"].apply(_fmt_pct)
+        result["推薦人新綁定數 YoY"] = _fmt_pct(result["推薦人新綁定數 YoY"])
 
         # Output per store
-        for sid, g in result.groupby(store_col):
-            out = g[[store_col, "月份", "2024年", "2025年", "推薦人新綁定數 YoY"]].sort_values("月份")
-            store_dir = OUTPUT_DIR / str(sid)
-            store_dir.mkdir(parents=True, exist_ok=True)
-            out.to_csv(store_dir / "23-2.csv", index=False, encoding="utf-8-sig")
+        out = result[[store_col, "月份", "2024年", "2025年", "推薦人新綁定數 YoY"]]
+        out = out.sort_values([store_col, "月份"])
+        _write_per_store(out, store_col, "23-2.csv")
 
         print(f"[OK] config=23-2, stores={result[store_col].nunique()}")
         return
 
     # ===== 24-1 KPI card (referral performance summary) =====
     if config_key == "24-1":
-        base_dir = INPUT_DIR / cfg["input_subdir"]
-
-        def _to_number(series: pd.Series) -> pd.Series:
-            s = series.astype(str).str.strip()
-            s = s.str.replace(",", "", regex=False)
-            s = s.str.replace("%", "", regex=False)
-            s = s.replace({"": pd.NA, "nan": pd.NA, "None": pd.NA})
-            return pd.to_numeric(s, errors="coerce")
-
-        def _fmt_pct(x):
-            if pd.isna(x):
-                return ""
-            return f"{x * 100:.2f}%"
-
         # --- Interval sum & YoY ---
-        src_file = "區間綁定推薦人人數.csv"
         store_col = "商店序號"
         year_col = "年度"
-        month_col = "月份"
         value_col = "總綁定"
 
-        df = pd.read_csv(base_dir / src_file, dtype=str)
-        df[store_col] = df[store_col].astype(str).str.strip()
-        df[value_col] = _to_number(df[value_col]).fillna(0)
+        df = _load_interval_bind()
 
-        df_2025 = df[df[year_col] == "2025"]
-        df_2024 = df[df[year_col] == "2024"]
-
-        sum_2025 = (
-            df_2025.groupby(store_col, as_index=False)[value_col]
-            .sum()
-            .rename(columns={value_col: "區間推薦人綁定人數"})
-        )
-
-        sum_2024 = (
-            df_2024.groupby(store_col, as_index=False)[value_col]
+        # 一次 groupby 同時算出今年與去年的加總（與 23-1 同一寫法），
+        # 取代「各年度各掃一次 + merge」的兩段式寫法
+        agg = (
+            df[df[year_col].isin(["2025", "2024"])]
+            .groupby([store_col, year_col])[value_col]
             .sum()
-            .rename(columns={value_col: "prev_value"})
+            .unstack(year_col)
         )
+        for year in ("2025", "2024"):
+            if year not in agg.columns:
+                agg[year] = float("nan")
 
-        result = sum_2025.merge(sum_2024, on=store_col, how="left")
+        # 僅保留今年有資料的商店（與原本以今年彙總為主表的 left merge 相同）
+        agg = agg[agg["2025"].notna()]
 
-        result["區間推薦人綁定人數 YoY"] = (
-            (result["區間推薦人綁定人數"] - result["prev_value"]) / result["prev_value"]
-        ).where(result["prev_value"] != 0)
+        result = (
+            agg.reset_index()
+            .rename(columns={"2025": "區間推薦人綁定人數", "2024": "prev_value"})
+        )
+        result["區間推薦人綁定人數 YoY"] = _yoy(
+            result["區間推薦人綁定人數"], result["prev_value"]
+        )
 
         # --- Referral rate ---
-        df_cum = pd.read_csv(base_dir / "累計至今綁定推薦人人數.csv", dtype=str)
-        df_cum[store_col] = df_cum[store_col].astype(str).str.strip()
-        df_cum["累計至今推薦人綁定人數"] = _to_number(
-            df_cum["累計至今推薦人綁定人數"]
-        ).fillna(0)
-
-        df_mem = pd.read_csv(base_dir / "14-1.會員成長趨勢_新增註冊會員數卡片.csv", dtype=str)
-        df_mem[store_col] = df_mem[store_col].astype(str).str.strip()
-        df_mem["總會員數"] = _to_number(df_mem["總會員數"]).fillna(0)
+        df_cum = _load_cumulative_bind()
+        df_mem = _load_member_total()
 
+        # 同 23-1：index 化後連續 left join 補齊兩欄
+        # （不可包成 list 一次 join，理由見 23-1 的註解）
         result = (
-            result
-            .merge(
-                df_cum[[store_col, "累計至今推薦人綁定人數"]],
-                on=store_col,
-                how="left",
-            )
-            .merge(
-                df_mem[[store_col, "總會員數"]],
-                on=store_col,
-                how="left",
-            )
+            result.set_index(store_col)
+            .join(df_cum.set_index(store_col)[["累計至今推薦人綁定人數"]], how="left")
+            .join(df_mem.set_index(store_col)[["總會員數"]], how="left")
+            .reset_index()
         )
 
-        result["推薦人綁定率"] = (
-            result["累計至今推薦人綁定人數"] / result["總會員數"]
-        ).where(result["總會員數"] != 0)
+        # unstack 會為缺年份補 NaN 而升成 float；整數來源轉回 int64
+        # 輸出才不會印成 "503.0"（同 23-1：放在 join 之後做，且不可
+        # 轉回 parse 時 downcast 的窄型別，年度加總會溢位迴繞）
+        if df[value_col].dtype.kind in "iu":
+            result["區間推薦人綁定人數"] = (
+                result["區間推薦人綁定人數"].astype("int64")
+            )
+
+        result["推薦人綁定率"] = _safe_ratio(
+            result["累計至今推薦人綁定人數"], result["總會員數"]
+        )
 
         # --- Format outputs ---
-        result["區間推薦人綁定人數 YoY"] = result["區間推薦人綁定人數 YoY"].apply(_fmt_pct)
-        result["推薦人綁定率"] = result["推薦人綁定率"].apply(_fmt_pct)
+        result["區間推薦人綁定人數 YoY"] = _fmt_pct(result["區間推薦人綁定人數 YoY"])
+        result["推薦人綁定率"] = _fmt_pct(result["推薦人綁定率"])
 
         result = result[[
             store_col,
@@ -405,81 +658,21 @@ def run_aggregation(config_key: str):
         ]]
 
         # --- Output ---
-        for _, row in result.iterrows():
-            sid = row[store_col]
-            store_dir = OUTPUT_DIR / str(sid)
-            store_dir.mkdir(parents=True, exist_ok=True)
-            row.to_frame().T.to_csv(
-                store_dir / "24-1.csv",
-                index=False,
-                encoding="utf-8-sig",
-            )
+        _write_per_store(result, store_col, "24-1.csv")
 
         print(f"[OK] config=24-1, stores={len(result)}")
         return
 
     # ===== 24-2 Monthly referral conversion rate =====
     if config_key == "24-2":
-        base_dir = INPUT_DIR / "aggregate"
-
-        def _to_number(series: pd.Series) -> pd.Series:
-            s = series.astype(str).str.strip()
-            s = s.str.replace(",", "", regex=False)
-            s = s.replace({"": pd.NA, "nan": pd.NA, "None": pd.NA})
-            return pd.to_numeric(s, errors="coerce")
-
-        def _fmt_pct(x):
-            if pd.isna(x):
-                return ""
-            return f"{x * 100:.2f}%"
-
-        def _parse_month(series: pd.Series) -> pd.Series:
-            # Accept formats like "01", "1", "202501", "2025-01", "2025/01", "2025-1"
-            s = series.astype(str).str.strip()
-            # Keep digits only
-            digits = s.str.replace(r"[^0-9]", "", regex=True)
-            # If YYYYMM (len>=6), take last 2 digits; otherwise take the full digits
-            m = digits.where(digits.str.len() < 6, digits.str[-2:])
-            # Convert to int and keep only 1..12
-            m_num = pd.to_numeric(m, errors="coerce")
-            m_num = m_num.where(m_num.between(1, 12))
-            return m_num.astype("Int64")
-
         store_col = "商店序號"
         month_col = "月份"
 
-        # Helper to ensure/rename month column
-        def _ensure_month_col(df: pd.DataFrame, preferred: str = "月份") -> pd.DataFrame:
-            if preferred in df.columns:
-                return df
-            # common variants
-            candidates = ["月", "月份(數字)", "month", "Month", "MONTH", "Established At Month"]
-            for c in candidates:
-                if c in df.columns:
-                    return df.rename(columns={c: preferred})
-            # try case-insensitive match
-            lowered = {str(c).lower(): c for c in df.columns}
-            if preferred.lower() in lowered:
-                return df.rename(columns={lowered[preferred.lower()]: preferred})
-            raise KeyError(f"Cannot find month column. Available columns: {list(df.columns) }")
-
         # --- 門市首購人數 ---
-        df_fp = pd.read_csv(base_dir / "門市首購人數_月份.csv", dtype=str)
-        df_fp.columns = df_fp.columns.astype(str).str.strip()
-        df_fp = _ensure_month_col(df_fp, month_col)
-        df_fp[store_col] = df_fp[store_col].astype(str).str.strip()
-        df_fp[month_col] = _parse_month(df_fp[month_col])
-        df_fp = df_fp[df_fp[month_col].notna()]
-        df_fp["門市首購人數"] = _to_number(df_fp["門市首購人數"]).fillna(0)
+        df_fp = _load_store_first_purchase()
 
         # --- 推薦人綁定數（2025） ---
-        df_ref = pd.read_csv(base_dir / "區間綁定推薦人人數.csv", dtype=str)
-        df_ref.columns = df_ref.columns.astype(str).str.strip()
-        df_ref = _ensure_month_col(df_ref, month_col)
-        df_ref[store_col] = df_ref[store_col].astype(str).str.strip()
-        df_ref[month_col] = _parse_month(df_ref[month_col])
-        df_ref = df_ref[df_ref[month_col].notna()]
-        df_ref["總綁定"] = _to_number(df_ref["總綁定"]).fillna(0)
+        df_ref = _load_interval_bind()
         df_ref = df_ref[df_ref["年度"] == "2025"]
 
         ref_monthly = (
@@ -493,233 +686,82 @@ def run_aggregation(config_key: str):
         result["推薦人綁定數"] = result["推薦人綁定數"].fillna(0)
 
         # --- 推薦人綁定率 ---
-        result["推薦人綁定率"] = (
-            result["推薦人綁定數"] / result["門市首購人數"]
-        ).where(result["門市首購人數"] != 0)
+        result["推薦人綁定率"] = _safe_ratio(
+            result["推薦人綁定數"], result["門市首購人數"]
+        )
 
-        result["推薦人綁定率"] = result["推薦人綁定率"].apply(_fmt_pct)
+        result["推薦人綁定率"] = _fmt_pct(result["推薦人綁定率"])
 
         # --- Output per store ---
-        for sid, g in result.groupby(store_col):
-            out = g[[store_col, month_col, "門市首購人數", "推薦人綁定數", "推薦人綁定率"]].sort_values(month_col)
-            store_dir = OUTPUT_DIR / str(sid)
-            store_dir.mkdir(parents=True, exist_ok=True)
-            out.to_csv(store_dir / "24-2.csv", index=False, encoding="utf-8-sig")
+        out = result[[store_col, month_col, "門市首購人數", "推薦人綁定數", "推薦人綁定率"]]
+        out = out.sort_values([store_col, month_col])
+        _write_per_store(out, store_col, "24-2.csv")
 
         print(f"[OK] config=24-2, stores={result[store_col].nunique()}")
         return
 
     # ===== 25-1 Store structure (Top 5 by referral ratio) =====
     if config_key == "25-1":
-        base_dir = INPUT_DIR / "aggregate"
-
-        def _to_number(series: pd.Series) -> pd.Series:
-            s = series.astype(str).str.strip()
-            s = s.str.replace(",", "", regex=False)
-            s = s.replace({"": pd.NA, "nan": pd.NA, "None": pd.NA})
-            return pd.to_numeric(s, errors="coerce")
-
-        def _fmt_pct_2(x):
-            if pd.isna(x):
-                return ""
-            return f"{x * 100:.2f}%"
-
         store_col = "商店序號"
         store_name_col = "門市名稱"
 
-        def _ensure_store_name_col(df: pd.DataFrame, preferred: str = "門市名稱") -> pd.DataFrame:
-            if preferred in df.columns:
-                return df
-            # common variants observed in files
-            candidates = [
-                "門市",
-                "門市名稱 ",
-                "Store Name",
-                "store_name",
-                "Name",
-                "門市名稱(中文)",
-                "門市名稱（中文）",
-            ]
-            for c in candidates:
-                if c in df.columns:
-                    return df.rename(columns={c: preferred})
-            # case-insensitive fallback
-            lowered = {str(c).lower(): c for c in df.columns}
-            if preferred.lower() in lowered:
-                return df.rename(columns={lowered[preferred.lower()]: preferred})
-            raise KeyError(f"Cannot find store name column. Available columns: {list(df.columns)}")
+        # 與 25-2 共用同一張佔比表（跨 config 快取），這裡只取前 5 名
+        result = _build_store_referral_ratio()
 
-        # --- 門市首購人數 ---
-        df_fp = pd.read_csv(base_dir / "門市首購人數_門市.csv", dtype=str)
-        df_fp.columns = df_fp.columns.astype(str).str.strip()
-        df_fp = _ensure_store_name_col(df_fp, store_name_col)
-        df_fp[store_col] = df_fp[store_col].astype(str).str.strip()
-        df_fp[store_name_col] = df_fp[store_name_col].astype(str).str.strip()
-        df_fp = df_fp[df_fp[store_name_col].notna()]
-        df_fp["門市首購人數"] = _to_number(df_fp["門市首購人數"]).fillna(0)
-
-        # --- 推薦人綁定人數（2025, per store name） ---
-        df_ref = pd.read_csv(base_dir / "各門市累計綁定人數.csv", dtype=str)
-        df_ref.columns = df_ref.columns.astype(str).str.strip()
-        df_ref = _ensure_store_name_col(df_ref, store_name_col)
-        df_ref[store_col] = df_ref[store_col].astype(str).str.strip()
-        df_ref[store_name_col] = df_ref[store_name_col].astype(str).str.strip()
-        df_ref = df_ref[df_ref[store_name_col].notna()]
-        df_ref = df_ref[df_ref["年度"] == "2025"]
-        df_ref["總綁定數"] = _to_number(df_ref["總綁定數"]).fillna(0)
-
-        ref_sum = (
-            df_ref
-            .groupby([store_col, store_name_col], as_index=False)["總綁定數"]
-            .sum()
-            .rename(columns={"總綁定數": "推薦人綁定人數"})
+        # --- Output per store (Top 5 per 商店序號) ---
+        # groupby.rank 一次取每商店前 5 名，取代逐商店整組排序後 head(5)
+        rank = result.groupby(store_col)["佔比"].rank(
+            ascending=False, method="first", na_option="bottom"
         )
-
-        # --- Merge ---
-        result = df_fp.merge(
-            ref_sum,
-            on=[store_col, store_name_col],
-            how="left"
+        top = (
+            result[rank <= 5]
+            .sort_values([store_col, "佔比"], ascending=[True, False])
+            .reset_index(drop=True)
         )
-        result["推薦人綁定人數"] = result["推薦人綁定人數"].fillna(0)
-
-        # --- 佔比 ---
-        result["佔比"] = (
-            result["推薦人綁定人數"] / result["門市首購人數"]
-        ).where(result["門市首購人數"] != 0)
+        top["佔比"] = _fmt_pct(top["佔比"])
 
-        # --- Output per store (Top 5 per 商店序號) ---
-        store_count = 0
-        for sid, g in result.groupby(store_col):
-            g = g.sort_values("佔比", ascending=False).head(5)
-            g["佔比"] = g["佔比"].apply(_fmt_pct_2)
-
-            out = g[[
-                store_col,
-                store_name_col,
-                "門市首購人數",
-                "推薦人綁定人數",
-                "佔比",
-            ]]
-
-            store_dir = OUTPUT_DIR / str(sid)
-            store_dir.mkdir(parents=True, exist_ok=True)
-            out.to_csv(store_dir / "25-1.csv", index=False, encoding="utf-8-sig")
-            store_count += 1
+        out = top[[
+            store_col,
+            store_name_col,
+            "門市首購人數",
+            "推薦人綁定人數",
+            "佔比",
+        ]]
+        _write_per_store(out, store_col, "25-1.csv")
 
-        print(f"[OK] config=25-1, stores={store_count}")
+        print(f"[OK] config=25-1, stores={out[store_col].nunique()}")
         return
 
     # ===== 25-2 Store structure (Bottom 5 by referral ratio) =====
     if config_key == "25-2":
-        base_dir = INPUT_DIR / "aggregate"
-
-        def _to_number(series: pd.Series) -> pd.Series:
-            s = series.astype(str).str.strip()
-            s = s.str.replace(",", "", regex=False)
-            s = s.replace({"": pd.NA, "nan": pd.NA, "None": pd.NA})
-            return pd.to_numeric(s, errors="coerce")
-
-        def _fmt_pct_2(x):
-            if pd.isna(x):
-                return ""
-            return f"{x * 100:.2f}%"
-
         store_col = "商店序號"
         store_name_col = "門市名稱"
 
-        def _ensure_store_name_col(df: pd.DataFrame, preferred: str = "門市名稱") -> pd.DataFrame:
-            if preferred in df.columns:
-                return df
-            candidates = [
-                "門市",
-                "Store Name",
-                "store_name",
-                "Name",
-            ]
-            for c in candidates:
-                if c in df.columns:
-                    return df.rename(columns={c: preferred})
-            lowered = {str(c).lower(): c for c in df.columns}
-            if preferred.lower() in lowered:
-                return df.rename(columns={lowered[preferred.lower()]: preferred})
-            raise KeyError(f"Cannot find store name column. Available columns: {list(df.columns)}")
+        # 與 25-1 共用同一張佔比表（跨 config 快取），這裡只取後 5 名
+        result = _build_store_referral_ratio()
 
-        # --- 門市首購人數 ---
-        df_fp = pd.read_csv(base_dir / "門市首購人數_門市.csv", dtype=str)
-        df_fp.columns = df_fp.columns.astype(str).str.strip()
-        df_fp = _ensure_store_name_col(df_fp, store_name_col)
-        df_fp[store_col] = df_fp[store_col].astype(str).str.strip()
-        df_fp[store_name_col] = (
-            df_fp[store_name_col]
-            .astype(str)
-            .str.strip()
-            .replace(
-                ["", "nan", "NaN", "NULL", "None"],
-                pd.NA
-            )
-        )
-        df_fp = df_fp[df_fp[store_name_col].notna()]
-        df_fp["門市首購人數"] = _to_number(df_fp["門市首購人數"]).fillna(0)
-
-        # --- 推薦人綁定人數（2025） ---
-        df_ref = pd.read_csv(base_dir / "各門市累計綁定人數.csv", dtype=str)
-        df_ref.columns = df_ref.columns.astype(str).str.strip()
-        df_ref = _ensure_store_name_col(df_ref, store_name_col)
-        df_ref[store_col] = df_ref[store_col].astype(str).str.strip()
-        df_ref[store_name_col] = (
-            df_ref[store_name_col]
-            .astype(str)
-            .str.strip()
-            .replace(
-                ["", "nan", "NaN", "NULL", "None"],
-                pd.NA
-            )
-        )
-        df_ref = df_ref[df_ref[store_name_col].notna()]
-        df_ref = df_ref[df_ref["年度"] == "2025"]
-        df_ref["總綁定數"] = _to_number(df_ref["總綁定數"]).fillna(0)
-
-        ref_sum = (
-            df_ref
-            .groupby([store_col, store_name_col], as_index=False)["總綁定數"]
-            .sum()
-            .rename(columns={"總綁定數": "推薦人綁定人數"})
+        # --- Output per store (Bottom 5 per 商店序號) ---
+        # groupby.rank 一次取每商店倒數 5 名，取代逐商店整組排序後 head(5)
+        rank = result.groupby(store_col)["佔比"].rank(
+            ascending=True, method="first", na_option="bottom"
         )
-
-        # --- Merge ---
-        result = df_fp.merge(
-            ref_sum,
-            on=[store_col, store_name_col],
-            how="left"
+        bottom = (
+            result[rank <= 5]
+            .sort_values([store_col, "佔比"], ascending=[True, True])
+            .reset_index(drop=True)
         )
-        result["推薦人綁定人數"] = result["推薦人綁定人數"].fillna(0)
+        bottom["佔比"] = _fmt_pct(bottom["佔比"])
 
-        # --- 佔比 ---
-        result["佔比"] = (
-            result["推薦人綁定人數"] / result["門市首購人數"]
-        ).where(result["門市首購人數"] != 0)
-
-        # --- Output per store (Bottom 5 per 商店序號) ---
-        store_count = 0
-        for sid, g in result.groupby(store_col):
-            g = g.sort_values("佔比", ascending=True).head(5)
-            g["佔比"] = g["佔比"].apply(_fmt_pct_2)
-
-            out = g[[
-                store_col,
-                store_name_col,
-                "門市首購人數",
-                "推薦人綁定人數",
-                "佔比",
-            ]]
-
-            store_dir = OUTPUT_DIR / str(sid)
-            store_dir.mkdir(parents=True, exist_ok=True)
-            out.to_csv(store_dir / "25-2.csv", index=False, encoding="utf-8-sig")
-            store_count += 1
+        out = bottom[[
+            store_col,
+            store_name_col,
+            "門市首購人數",
+            "推薦人綁定人數",
+            "佔比",
+        ]]
+        _write_per_store(out, store_col, "25-2.csv")
 
-        print(f"[OK] config=25-2, stores={store_count}")
+        print(f"[OK] config=25-2, stores={out[store_col].nunique()}")
         return
 
     input_base = INPUT_DIR
@@ -730,7 +772,13 @@ def run_aggregation(config_key: str):
     if not input_path.exists():
         raise FileNotFoundError(input_path)
 
-    df = pd.read_csv(input_path, dtype=str)
+    df = _load_csv(input_path)
+
+    # 先篩月份、只留需要的兩欄，之後的轉型與彙總都在最小資料量上進行
+    df = df.loc[
+        df[cfg["month_col"]].isin(cfg["months"]),
+        [cfg["store_col"], cfg["target_col"]],
+    ]
 
     # 數值欄位轉型
     df[cfg["target_col"]] = (
@@ -738,26 +786,16 @@ def run_aggregation(config_key: str):
         .fillna(0)
     )
 
-    # 篩選月份
-    df = df[df[cfg["month_col"]].isin(cfg["months"])]
-
-    # 依商店彙總
+    # 依商店彙總（categorical key 讓 groupby 走整數 code 快路徑）
+    df[cfg["store_col"]] = df[cfg["store_col"]].astype("category")
     result = (
-        df.groupby(cfg["store_col"], as_index=False)[cfg["target_col"]]
+        df.groupby(cfg["store_col"], as_index=False, observed=True)[cfg["target_col"]]
         .sum()
         .rename(columns={cfg["target_col"]: "total"})
     )
 
     # 依商店序號輸出檔案
-    for _, row in result.iterrows():
-        store_id = row[cfg["store_col"]]
-        store_dir = OUTPUT_DIR / str(store_id)
-        store_dir.mkdir(parents=True, exist_ok=True)
-
-        output_path = store_dir / cfg["input_file"]
-        pd.DataFrame([row]).to_csv(
-            output_path, index=False, encoding="utf-8-sig"
-        )
+    _write_per_store(result, cfg["store_col"], cfg["input_file"])
 
     print(f"[OK] config={config_key}, stores={len(result)}")
 
@@ -765,8 +803,17 @@ def run_aggregation(config_key: str):
 def main():
     parser = argparse.ArgumentParser(description="Aggregate by store with config key")
     parser.add_argument("--config", required=True, help="config key, e.g. 23-1")
+    parser.add_argument(
+        "--format",
+        choices=["csv", "csv-single"],
+        default="csv",
+        help="csv=每商店一檔（預設）；csv-single=單一合併檔（快）",
+    )
     args = parser.parse_args()
 
+    global OUTPUT_FORMAT
+    OUTPUT_FORMAT = args.format
+
     run_aggregation(args.config)
 
 
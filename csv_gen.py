@@ -3,7 +3,10 @@ import argparse
 import csv
 import os
 import random
-from datetime import date, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
 
 DATA_TYPES = ["string", "int", "float", "date", "bool"]
 
@@ -21,25 +24,21 @@ def random_column_name(rng: random.Random, used: set):
             return name
 
 
-def random_date(rng: random.Random):
-    start = date(2018, 1, 1)
-    end = date(2024, 12, 31)
-    delta_days = (end - start).days
-    return (start + timedelta(days=rng.randint(0, delta_days))).isoformat()
-
-
-def random_value(rng: random.Random, dtype: str):
+def random_column(np_rng: np.random.Generator, dtype: str, rows: int):
+    # whole column in one vectorized draw instead of one call per cell
     if dtype == "string":
-        return f"val_{rng.randint(10000, 99999)}"
+        return np.char.add("val_", np_rng.integers(10000, 100000, size=rows).astype(str))
     if dtype == "int":
-        return rng.randint(-100000, 100000)
+        return np_rng.integers(-100000, 100001, size=rows)
     if dtype == "float":
-        return f"{rng.uniform(-10000, 10000):.4f}"
+        return np.char.mod("%.4f", np_rng.uniform(-10000, 10000, size=rows))
     if dtype == "date":
-        return random_date(rng)
+        delta_days = (date(2024, 12, 31) - date(2018, 1, 1)).days
+        offsets = np_rng.integers(0, delta_days + 1, size=rows)
+        return (np.datetime64("2018-01-01") + offsets).astype(str)
     if dtype == "bool":
-        return rng.choice(["true", "false"])
-    return ""
+        return np_rng.choice(["true", "false"], size=rows)
+    return np.full(rows, "")
 
 
 def generate_schema(rng: random.Random, min_cols: int, max_cols: int):
@@ -58,17 +57,29 @@ def generate_schema(rng: random.Random, min_cols: int, max_cols: int):
 
 def write_csv(path, rows, store_ids, rng, min_cols, max_cols):
     columns, types = generate_schema(rng, min_cols, max_cols)
+    np_rng = np.random.default_rng(rng.getrandbits(64))
+
+    data = [np_rng.choice(store_ids, size=rows)]
+    for dtype in types[1:]:
+        data.append(random_column(np_rng, dtype, rows))
 
     with open(path, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         writer.writerow(columns)
-
-        for _ in range(rows):
-            store_id = rng.choice(store_ids)
-            row = [store_id]
-            for dtype in types[1:]:
-                row.append(random_value(rng, dtype))
-            writer.writerow(row)
+        writer.writerows(zip(*data))
+
+
+def generate_file(path, rows, subseed, store_ids, min_cols, max_cols):
+    # each worker builds its own RNG from a deterministic sub-seed
+    rng = random.Random(subseed)
+    write_csv(
+        path,
+        rows=rows,
+        store_ids=store_ids,
+        rng=rng,
+        min_cols=min_cols,
+        max_cols=max_cols,
+    )
 
 
 def parse_args():
@@ -100,18 +111,30 @@ def main():
 
     store_ids = build_store_ids(args.store_count)
 
+    # files are independent: draw rows + a sub-seed per file up front
+    # (deterministic for a fixed --seed), then generate in parallel
+    tasks = []
     for i in range(1, args.csv_count + 1):
         rows = rng.randint(args.min_rows, args.max_rows)
+        subseed = rng.getrandbits(64)
         filename = f"data_{i:02d}.csv"
-        path = os.path.join(args.output_dir, filename)
-        write_csv(
-            path,
-            rows=rows,
-            store_ids=store_ids,
-            rng=rng,
-            min_cols=args.min_cols,
-            max_cols=args.max_cols,
-        )
+        tasks.append((os.path.join(args.output_dir, filename), rows, subseed))
+
+    with ProcessPoolExecutor() as pool:
+        futures = [
+            pool.submit(
+                generate_file,
+                path,
+                rows,
+                subseed,
+                store_ids,
+                args.min_cols,
+                args.max_cols,
+            )
+            for path, rows, subseed in tasks
+        ]
+        for future in futures:
+            future.result()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 import argparse
+import collections
 import csv
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+# 同時保持開啟的輸出檔上限，超過就關掉最久沒用到的（LRU）
+MAX_OPEN_FILES = 512
 
 
 def iter_csv_files(input_dir: str):
@@ -29,23 +34,43 @@ def split_csv_file(path: str, name: str, output_dir: str, encoding: str):
             print(f"[warn] missing 商店序號 header, skipped: {path}")
             return
 
-        for row in reader:
-            if store_idx >= len(row):
-                continue
-            store_id = row[store_idx].strip()
-            if store_id == "":
-                continue
+        # 依商店序號快取已開啟的檔案與 writer，避免每一列都 open/close
+        open_files = collections.OrderedDict()
+
+        def get_writer(store_id: str):
+            cached = open_files.get(store_id)
+            if cached is not None:
+                open_files.move_to_end(store_id)
+                return cached[1]
+
+            if len(open_files) >= MAX_OPEN_FILES:
+                _, (old_f, _) = open_files.popitem(last=False)
+                old_f.close()
+
             store_dir = os.path.join(output_dir, store_id)
             os.makedirs(store_dir, exist_ok=True)
             out_path = os.path.join(store_dir, name)
             needs_header = not os.path.exists(out_path) or os.path.getsize(out_path) == 0
-            with open(out_path, "a", newline="", encoding=encoding) as out_f:
-                writer = csv.writer(out_f)
-                if needs_header:
-                    for r in prefix_rows:
-                        writer.writerow(r)
-                    writer.writerow(header)
-                writer.writerow(row)
+            out_f = open(out_path, "a", newline="", encoding=encoding)
+            writer = csv.writer(out_f)
+            if needs_header:
+                for r in prefix_rows:
+                    writer.writerow(r)
+                writer.writerow(header)
+            open_files[store_id] = (out_f, writer)
+            return writer
+
+        try:
+            for row in reader:
+                if store_idx >= len(row):
+                    continue
+                store_id = row[store_idx].strip()
+                if store_id == "":
+                    continue
+                get_writer(store_id).writerow(row)
+        finally:
+            for out_f, _ in open_files.values():
+                out_f.close()
 
 
 def parse_args():
@@ -62,9 +87,17 @@ def main():
     args = parse_args()
     os.makedirs(args.output_dir, exist_ok=True)
 
-    for path, name in iter_csv_files(args.input_dir):
-        print(f"[info] processing: {path}")
-        split_csv_file(path, name, args.output_dir, args.encoding)
+    # 每個輸入檔只寫 output_dir/<商店序號>/<自己的檔名>，
+    # 檔案之間互不相干，可以放心平行處理
+    with ProcessPoolExecutor() as pool:
+        futures = []
+        for path, name in iter_csv_files(args.input_dir):
+            print(f"[info] processing: {path}")
+            futures.append(
+                pool.submit(split_csv_file, path, name, args.output_dir, args.encoding)
+            )
+        for future in futures:
+            future.result()
 
 
 if __name__ == "__main__":